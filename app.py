@@ -1,23 +1,144 @@
 from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import atexit
+import functools
+import heapq
 import random
 import os
-import json
-from dotenv import load_dotenv
-from supabase import create_client, Client
+import httpx
+import orjson
+from flask_caching import Cache
+from postgrest import APIError
+from supabase import create_client, Client, ClientOptions
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that serializes with orjson instead of the stdlib json module.
+
+    orjson always emits UTF-8 without escaping non-ASCII characters, so Japanese
+    text is returned as-is.
+    """
+
+    @property
+    def option(self):
+        # NOTE: DefaultJSONProvider と同じくキーをソートする
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # NOTE: bytesのままレスポンスにしてdecodeを省く
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option), mimetype=self.mimetype
+        )
+
+
+# NOTE: .envファイルは開発環境でだけ読み込む。本番では環境変数を直接設定する
+if os.getenv("FLASK_ENV") == "development":
+    from dotenv import load_dotenv
+
+    load_dotenv()
 
 app = Flask(__name__)
-app.json.ensure_ascii = False  # NOTE: 日本語文字化け対策
+app.json = ORJSONProvider(app)  # NOTE: 日本語文字化け対策も兼ねる
+# NOTE: ルートロガーには設定しない。httpx等のライブラリのリクエストごとのINFOログは出さない
+logger = app.logger
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO"))
 CORS(app)
 
-# .envファイルの内容を読み込む
-load_dotenv()
-SUPABASE_PROJECT_URL: str = os.getenv("SUPABASE_PROJECT_URL")
-SUPABASE_API_KEY: str = os.getenv("SUPABASE_API_KEY")
-supabase: Client = create_client(
+
+@functools.cache
+def supabase_config() -> tuple[str, str]:
+    """
+    Return the Supabase project URL and API key from the environment.
+
+    Raises RuntimeError at startup if either is missing, instead of failing later
+    inside httpx with a None URL.
+    """
+    missing = [name for name in ("SUPABASE_PROJECT_URL", "SUPABASE_API_KEY") if not os.getenv(name)]
+    if missing:
+        raise RuntimeError(f"Missing environment variables: {', '.join(missing)}")
+    return os.environ["SUPABASE_PROJECT_URL"], os.environ["SUPABASE_API_KEY"]
+
+
+def create_pooled_client(supabase_url: str, supabase_key: str) -> Client:
+    """
+    Create a Supabase client whose sub-clients (PostgREST, auth, storage, functions)
+    share one httpx session with explicit pool limits and timeouts.
+    """
+    # NOTE: supabase-py のデフォルトと同じく HTTP/2 とリダイレクトを有効にする
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        timeout=httpx.Timeout(10.0, connect=2.0),
+        http2=True,
+        follow_redirects=True,
+    )
+    atexit.register(http_client.close)
+
+    return create_client(
+        supabase_url=supabase_url,
+        supabase_key=supabase_key,
+        options=ClientOptions(httpx_client=http_client),
+    )
+
+
+SUPABASE_PROJECT_URL, SUPABASE_API_KEY = supabase_config()
+supabase: Client = create_pooled_client(
     supabase_url=SUPABASE_PROJECT_URL, supabase_key=SUPABASE_API_KEY
 )
 
+def fetch_latest_goal(status=None):
+    # goalsの最新のcreated_atを取得する
+    query = supabase.table("goals").select("*")
+    if status is not None:
+        query = query.eq("status", status)
+    goals_response = query.order("created_at", desc=True).limit(1).execute()
+    # NOTE: ゴールがまだ無い場合は None を返す
+    return goals_response.data[0] if goals_response.data else None
+
+
+# NOTE: 最新のゴールは読み取りのエンドポイントで毎回使うので短い時間キャッシュする
+# gunicornの全workerで共有して更新時にまとめて消せるよう、REDIS_URL がある場合だけRedisにキャッシュする
+# workerごとのキャッシュだと古いゴールを返してしまうので、REDIS_URL が無い場合はキャッシュしない
+cache = Cache(app, config={
+    "CACHE_TYPE": "RedisCache" if os.getenv("REDIS_URL") else "NullCache",
+    "CACHE_REDIS_URL": os.getenv("REDIS_URL"),
+    "CACHE_DEFAULT_TIMEOUT": 30,
+    "CACHE_NO_NULL_WARNING": True,
+})
+
+
+@cache.memoize()
+def get_latest_goal(status=None):
+    return fetch_latest_goal(status)
+
+
+# 各エンドポイントのリクエストボディに必要なキー
+SUGGEST_KEYS = frozenset({"goal", "goal_points", "tasks"})
+SUBMIT_KEYS = frozenset({"day", "total_points"})
+
+
+def is_int(value):
+    # NOTE: JSONの true/false はPythonでは int のサブクラスなので除外する
+    return isinstance(value, int) and not isinstance(value, bool)
+
+# 毎回同じ、または整数だけが変わるレスポンスはあらかじめエンコードしておく
+HELLO_WORLD_BODY = orjson.dumps({"message": "Hello, World!"})
+POINTS_BODY_TEMPLATE = b'{"points":%d}'
+
+# プランを作る日数
+DEFAULT_DAYS = tuple(range(1, 8))
+
 
 @app.route("/")
 def hello_world():
@@ -36,14 +157,15 @@ def hello_world():
             "message": "Hello, World!"
         }
     """
-    data = {"message": "Hello, World!"}
-    return jsonify(data), 200
+    # NOTE: レスポンスヘッダーはCORSで書き換えられるので、Responseは毎回作る
+    return app.response_class(HELLO_WORLD_BODY, mimetype="application/json"), 200
 
 
+@app.route("/api/v1/plans/suggest", methods=["POST"])
 @app.route("/api/v2/plans/suggest", methods=["POST"])
-def suggest_plans_v2():
+def suggest_plans():
     """
-    API Endpoint: /api/v1/plans/suggest
+    API Endpoint: /api/v1/plans/suggest, /api/v2/plans/suggest
     HTTP Method: POST
 
     Generate suggested daily plans based on the user's goal and tasks.
@@ -61,6 +183,12 @@ def suggest_plans_v2():
                 {"task": "wash dishes", "point": 2}
             ]
         }
+        Each task's points may also be given as "award" instead of "point",
+        and tasks may mix the two.
+        A task may also have "precedes", a list of positions (0-based) in "tasks"
+        of the tasks that must come after it, e.g.
+            {"task": "buy detergent", "point": 1, "precedes": [0]}
+        Positions out of range or cyclic "precedes" are a Bad Request.
 
     Response:
     - Success (HTTP 200 OK):
@@ -68,105 +196,155 @@ def suggest_plans_v2():
             "plans": [
                 {"day": 1, "plans_today": [{"task": "cleaning", "point": 5}, ...]},
                 {"day": 2, "plans_today": []},
-            ]
+            ],
+            "goals_relations_id": 1,
+            "plans_ids_id": 1
         }
+        Pass "goals_relations_id" to /api/v1/plans/accept to accept these plans.
+        "plans_ids_id" has the same value and is kept for existing clients.
     - Bad Request (HTTP 400 Bad Request):
         {
             "error": "Invalid data format"
         }
     """
 
-    try:
-        # POSTリクエストのボディからJSONデータを取得
-        request_data = request.get_json()
-
-        # 必要なデータが揃っているか確認
-        if not (
-            "goal" in request_data
-            and "goal_points" in request_data
-            and "tasks" in request_data
+    # POSTリクエストのボディからJSONデータを取得
+    request_data = request.get_json(silent=True)
+    if not isinstance(request_data, dict):
+        # JSONのオブジェクトとして読めない場合はエラーメッセージを返す
+        return jsonify({"error": "Invalid data format"}), 400
+
+    # 必要なデータが揃っているか確認
+    if not SUGGEST_KEYS.issubset(request_data):
+        # 必要なデータが見つからない場合はエラーメッセージを返す
+        return jsonify({"error": "Invalid data format"}), 400
+
+    goal = request_data["goal"]
+    goal_points = request_data["goal_points"]
+    tasks = request_data["tasks"]
+    # ゴールの形式を確認
+    if not isinstance(goal, str) or not is_int(goal_points):
+        return jsonify({"error": "Invalid data format"}), 400
+    # タスクの形式を確認
+    if not isinstance(tasks, list) or not tasks or not all(
+        isinstance(task, dict) and isinstance(task.get("task"), str) for task in tasks
+    ):
+        return jsonify({"error": "Invalid data format"}), 400
+
+    # NOTE: タスクのIDはまだ無いので、リクエスト内の位置を仮のIDとしてプランを生成する
+    provisional_tasks = []
+    for index, task in enumerate(tasks):
+        # NOTE: タスクのポイントは "point" または "award" で受け取る
+        point = task.get("point", task.get("award"))
+        if not is_int(point):
+            # ポイントが見つからない場合はエラーメッセージを返す
+            return jsonify({"error": "Invalid data format"}), 400
+        # NOTE: precedes はリクエスト内のタスクの位置で指定する
+        precedes = task.get("precedes", [])
+        if not isinstance(precedes, list) or not all(
+            is_int(next_index) and 0 <= next_index < len(tasks) for next_index in precedes
         ):
-            # 必要なデータが見つからない場合はエラーメッセージを返す
             return jsonify({"error": "Invalid data format"}), 400
-        
-        goal = request_data["goal"]
-        goal_points = request_data["goal_points"]
-        tasks = request_data["tasks"]
-
-
-        # supabaseでゴール、タスク、プランを保存する
-        # NOTE: supabase-py に transaction がないので危険
-        goal_response = supabase.table("goals").insert({"item_name": goal, "item_points": goal_points}).execute()
-        goal_response_json = goal_response.json()
-        goal_response_dict = json.loads(goal_response_json)["data"][0]
-
-        print("created:", goal_response_dict)
-        
-        tasks_response = supabase.table("tasks").insert([{"task": task["task"], "point": task["point"], "goal_id": goal_response_dict["id"]} for task in tasks]).execute()
-        tasks_response_json = tasks_response.json()
-        tasks_response_dict = json.loads(tasks_response_json)["data"]
-
-        print("created:", tasks_response_dict)
-
-        tasks_ids_response = supabase.table("tasks_ids").insert([{"tasks_ids": [task["id"] for task in tasks_response_dict]}]).execute()
-        tasks_ids_response_json = tasks_ids_response.json()
-        tasks_ids_response_dict = json.loads(tasks_ids_response_json)["data"][0]
-
-        plans = generate_daily_plans_tmp(goal=goal_response_dict, tasks=tasks_response_dict)
-        # NOTE: flatmap的なこと
-        plans_processed = []
-        for plan in plans:
-            for task in plan["plans_today"]:
-                plans_processed.append({"day": plan["day"], "task_id": task["id"]})
-        plans_response = supabase.table("plans").insert(plans_processed).execute()
-        plans_response_json = plans_response.json()
-        plans_response_dict = json.loads(plans_response_json)["data"]
-
-        print("created:", plans_response_dict)
-
-        plans_ids_response = supabase.table("plans_ids").insert([{"plans_ids": [plan["id"] for plan in plans_response_dict]}]).execute()
-        plans_ids_response_json = plans_ids_response.json()
-        plans_ids_response_dict = json.loads(plans_ids_response_json)["data"][0]
-
-        # 生成したプランを含むレスポンスを返す
-        return jsonify({"plans": plans, "plans_ids_id": plans_ids_response_dict["id"], "tasks_ids_id": tasks_ids_response_dict["id"]}), 200
-
-    except Exception as e:
-        # 例外が発生した場合はエラーメッセージを返す
-        return jsonify({"error": str(e)}), 500
-
+        provisional_tasks.append({**task, "id": index, "point": point, "precedes": precedes})
+    try:
+        plans = generate_daily_plans(tasks=provisional_tasks)
+    except ValueError:
+        # タスクの順番が循環している場合はエラーメッセージを返す
+        return jsonify({"error": "Invalid data format"}), 400
+    plans_processed = [{"day": plan["day"], "task_index": plan["task_id"]} for plan in plans]
 
-def generate_daily_plans(goal, tasks, days=7):
-    goal_id = int(goal["id"])
+    try:
+        # supabaseでゴール、タスク、プランを1つのトランザクションで保存する
+        created_response = supabase.rpc("create_goal_with_plans", {
+            "p_goal": {"item_name": goal, "item_points": goal_points},
+            "p_tasks": [{"task": task["task"], "point": task["point"]} for task in provisional_tasks],
+            "p_plans": plans_processed,
+        }).execute()
+    except (APIError, httpx.HTTPError):
+        # supabaseとの通信で失敗した場合はエラーメッセージを返す
+        logger.exception("supabase")
+        return jsonify({"error": "upstream"}), 502
+
+    created_response_dict = created_response.data
+    cache.delete_memoized(get_latest_goal)
+
+    logger.debug("created: %s", created_response_dict)
+
+    # 仮のIDを作成されたタスクに置き換えて、日ごとにまとめる
+    created_tasks = created_response_dict["tasks"]
+    plans_today_by_day = {day: [] for day in DEFAULT_DAYS}
+    for plan in plans:
+        plans_today_by_day[plan["day"]].append(created_tasks[plan["task_id"]])
+    plans = [{"day": day, "plans_today": plans_today} for day, plans_today in sorted(plans_today_by_day.items())]
+
+    # 生成したプランを含むレスポンスを返す
+    # NOTE: 既存のクライアントのため plans_ids_id としても goals_relations の id を返す
+    goals_relations_id = created_response_dict["goals_relations_id"]
+    return jsonify({"plans": plans, "goals_relations_id": goals_relations_id, "plans_ids_id": goals_relations_id}), 200
+
+
+def generate_daily_plans(tasks, days=len(DEFAULT_DAYS)):
     task_ids = [int(task["id"]) for task in tasks]
 
-    # 毎日スケジュール
-    daily_plans = []
+    # 順番の決まっているタスクがある場合はその順番を守って分配する
+    if any(task.get("precedes") for task in tasks):
+        return schedule_daily_plans(tasks, days)
 
-    # 毎日、少なくとも一つのTODO
-    for day in range(1, days + 1):
-        task_id = random.choice(task_ids)
-        daily_plans.append({"goal_id": goal_id, "day": day, "task_id": task_id})
+    # 毎日、少なくとも一つのTODO、残りのTODOがある場合はランダムに各日に分配
+    num_plans = max(days, len(task_ids))
+    day_range = DEFAULT_DAYS if days == len(DEFAULT_DAYS) else range(1, days + 1)
+    plan_days = [*day_range, *random.choices(day_range, k=num_plans - days)]
+    plan_task_ids = random.choices(task_ids, k=num_plans)
 
-    # 残りのTODOがある場合、ランダムに各日に分配
-    remaining_tasks = len(task_ids) - days
-    for _ in range(remaining_tasks):
-        day = random.randint(1, days)
-        task_id = random.choice(task_ids)
-        daily_plans.append({"goal_id": goal_id, "day": day, "task_id": task_id})
+    return [{"day": day, "task_id": task_id} for day, task_id in zip(plan_days, plan_task_ids)]
 
-    # 各TODOにポイント数
-    for plan in daily_plans:
-        plan['points'] = random.randint(1, 5)
 
-    return daily_plans
+def schedule_daily_plans(tasks, days):
+    """
+    Schedule tasks so that every task comes no later than the tasks it precedes.
 
-def generate_daily_plans_tmp(goal, tasks):
-    # FIXME: delete this
-    return [
-        {"day": 1, "plans_today": [random.choice(tasks)]},
-        {"day": 2, "plans_today": [random.choice(tasks)]},
-    ]
+    Each task may have "precedes", a list of ids of tasks that must be done after it.
+    Among the tasks whose predecessors are all scheduled, the one with the most points
+    is picked first, and the resulting order is spread over the days so that every day
+    has at least one task; with fewer tasks than days, tasks are repeated on
+    consecutive days. Raises ValueError for unknown ids or cyclic precedence.
+    """
+    tasks_by_id = {int(task["id"]): task for task in tasks}
+
+    # 各タスクより先にやる必要があるタスクの数
+    num_predecessors = dict.fromkeys(tasks_by_id, 0)
+    for task in tasks:
+        for next_id in task.get("precedes", []):
+            if next_id not in num_predecessors:
+                raise ValueError(f"unknown task in precedes: {next_id}")
+            num_predecessors[next_id] += 1
+
+    # 今やれるタスクのうち、ポイントの高いものから順に選ぶ
+    ready = [(-task["point"], task_id) for task_id, task in tasks_by_id.items() if num_predecessors[task_id] == 0]
+    heapq.heapify(ready)
+    ordered_task_ids = []
+    while ready:
+        _, task_id = heapq.heappop(ready)
+        ordered_task_ids.append(task_id)
+        for next_id in tasks_by_id[task_id].get("precedes", []):
+            num_predecessors[next_id] -= 1
+            if num_predecessors[next_id] == 0:
+                heapq.heappush(ready, (-tasks_by_id[next_id]["point"], next_id))
+
+    if len(ordered_task_ids) < len(tasks_by_id):
+        raise ValueError("tasks have cyclic precedence")
+
+    # 毎日、少なくとも一つのTODO。順番は崩さずに各日に分配する
+    num_tasks = len(ordered_task_ids)
+    if num_tasks >= days:
+        plan_days = [1 + index * days // num_tasks for index in range(num_tasks)]
+        plan_task_ids = ordered_task_ids
+    else:
+        # NOTE: タスクが日数より少ない場合は、同じタスクを続く日にも割り当てる
+        plan_days = list(range(1, days + 1))
+        plan_task_ids = [ordered_task_ids[(day - 1) * num_tasks // days] for day in plan_days]
+
+    return [{"day": day, "task_id": task_id} for day, task_id in zip(plan_days, plan_task_ids)]
 
 
 @app.route("/api/v1/plans/accept", methods=["POST"])
@@ -183,9 +361,12 @@ def accept_plan():
         Content-Type: application/json
     - Body (JSON):
         {
-            "plans_ids_id": 1,
-            "tasks_ids_id": 3,
+            "goals_relations_id": 1
         }
+        "goals_relations_id" is the value returned by /api/v1/plans/suggest.
+        Existing clients may send "plans_ids_id" (and "tasks_ids_id") as before;
+        "plans_ids_id" is used when "goals_relations_id" is missing, and
+        "tasks_ids_id" is ignored.
 
     Response:
     - Success (HTTP 200 OK):
@@ -196,39 +377,46 @@ def accept_plan():
         {
             "error": "Invalid data format"
         }
+    - Not Found (HTTP 404 Not Found):
+        {
+            "error": "Plan not found"
+        }
     """
 
-    try:
-       # POSTリクエストのボディからJSONデータを取得
-        request_data = request.get_json()
-
-        # 必要なデータが揃っているか確認
-        if "plans_ids_id" in request_data and "tasks_ids_id" in request_data:
-            plans_ids_id = request_data["plans_ids_id"]
-            tasks_ids_id = request_data["tasks_ids_id"]
-
-            # goalsの最新のcreated_atを取得する
-            goals_response = supabase.table("goals").select("*").order("created_at", desc=True).limit(1).execute()
-            goals_response_json = goals_response.json()
-            goals_response_dict = json.loads(goals_response_json)["data"][0]
-
-            print("latest_goal:", goals_response_dict)
-            
-            supabase.table("goals").update({"status": 1}).eq("id", goals_response_dict["id"]).execute()
-
-            # relationsを整備
-            supabase.table("goals_relations").insert({"goal_id": goals_response_dict["id"], "plans_ids_id": plans_ids_id, "tasks_ids_id": tasks_ids_id}).execute()
-
-            # レスポンスとしてメッセージを返す
-            data = {"message": "Plan accepted"}
-            return jsonify(data), 200
-        else:
-            # 必要なデータが見つからない場合はエラーメッセージを返す
-            return jsonify({"error": "Invalid data format"}), 400
+    # POSTリクエストのボディからJSONデータを取得
+    request_data = request.get_json(silent=True)
+    if not isinstance(request_data, dict):
+        # JSONのオブジェクトとして読めない場合はエラーメッセージを返す
+        return jsonify({"error": "Invalid data format"}), 400
+
+    # NOTE: 既存のクライアントは goals_relations の id を plans_ids_id として送ってくる
+    goals_relations_id = request_data.get("goals_relations_id", request_data.get("plans_ids_id"))
 
-    except Exception as e:
-        # 例外が発生した場合はエラーメッセージを返す
-        return jsonify({"error": str(e)}), 500
+    # 必要なデータが揃っているか確認
+    if not is_int(goals_relations_id):
+        # 必要なデータが見つからない場合はエラーメッセージを返す
+        return jsonify({"error": "Invalid data format"}), 400
+
+    try:
+        # NOTE: goals_relations は /plans/suggest で作成済みなので、そのゴールを確定するだけ
+        goals_relations_response = supabase.table("goals_relations").select("goal_id").eq("id", goals_relations_id).execute()
+        if not goals_relations_response.data:
+            # 提案されたプランが見つからない場合はエラーメッセージを返す
+            return jsonify({"error": "Plan not found"}), 404
+        goal_id = goals_relations_response.data[0]["goal_id"]
+
+        logger.debug("accepted_goal_id: %s", goal_id)
+
+        supabase.table("goals").update({"status": 1}).eq("id", goal_id).execute()
+        cache.delete_memoized(get_latest_goal)
+    except (APIError, httpx.HTTPError):
+        # supabaseとの通信で失敗した場合はエラーメッセージを返す
+        logger.exception("supabase")
+        return jsonify({"error": "upstream"}), 502
+
+    # レスポンスとしてメッセージを返す
+    data = {"message": "Plan accepted"}
+    return jsonify(data), 200
 
 
 @app.route("/api/v1/goals")
@@ -248,14 +436,23 @@ def check_goal():
             "goal": "computer",
             "goal_points": 100
         }
+    - Not Found (HTTP 404 Not Found):
+        {
+            "error": "Goal not found"
+        }
     """
 
-    # ここでは固定のゴールと目標ポイントを返す例
-    goal_response = supabase.table("goals").select("*").eq("status", 1).order("created_at", desc=True).limit(1).execute()
-    goal_response_json = goal_response.json()
-    goal_response_dict = json.loads(goal_response_json)["data"][0]
+    try:
+        goal_response_dict = get_latest_goal(status=1)
+        if goal_response_dict is None:
+            # ゴールがまだ無い場合はエラーメッセージを返す
+            return jsonify({"error": "Goal not found"}), 404
+    except (APIError, httpx.HTTPError):
+        # supabaseとの通信で失敗した場合はエラーメッセージを返す
+        logger.exception("supabase")
+        return jsonify({"error": "upstream"}), 502
 
-    print("latest_goal:", goal_response_dict)
+    logger.debug("latest_goal: %s", goal_response_dict)
 
     return jsonify({"goal": goal_response_dict["item_name"], "goal_points": goal_response_dict["item_points"]}), 200
 
@@ -301,10 +498,10 @@ def check_progress():
 def suggest_adjusted_plans():
     # 新たなプラン生成のロジックを追加する
     # ここでは単にランダムにプランを生成する例
-    num_days = random.randint(1, 7)
+    num_days = random.randint(1, len(DEFAULT_DAYS))
     adjusted_plans = [
         {"day": day, "plans_today": [{"task": "cleaning", "point": 5}]}
-        for day in range(1, num_days + 1)
+        for day in DEFAULT_DAYS[:num_days]
     ]
     return adjusted_plans
 
@@ -338,59 +535,56 @@ def get_today_plans():
         {
             "error": "Invalid data format"
         }
+    - Not Found (HTTP 404 Not Found):
+        {
+            "error": "Goal not found"
+        }
+        or
+        {
+            "error": "Plans not found"
+        }
     """
 
-    try:
-        # POSTリクエストのボディからJSONデータを取得
-        request_data = request.get_json()
-
-        # 必要なデータが揃っているか確認
-        if "day" in request_data:
-            day = request_data["day"]
-
-            # TODO: データベースから指定された日のプランを取得するロジックを追加
-            # goalsの最新のcreated_atを取得する
-            goals_response = supabase.table("goals").select("*").order("created_at", desc=True).limit(1).execute()
-            goals_response_json = goals_response.json()
-            goals_response_dict = json.loads(goals_response_json)["data"][0]
+    # POSTリクエストのボディからJSONデータを取得
+    request_data = request.get_json(silent=True)
+    if not isinstance(request_data, dict):
+        # JSONのオブジェクトとして読めない場合はエラーメッセージを返す
+        return jsonify({"error": "Invalid data format"}), 400
 
-            print("latest_goal:", goals_response_dict)
+    # 必要なデータが揃っているか確認
+    if not is_int(request_data.get("day")):
+        # 必要なデータが見つからない場合はエラーメッセージを返す
+        return jsonify({"error": "Invalid data format"}), 400
 
-            plans_ids_id_response = supabase.table("goals_relations").select("plans_ids_id").eq("goal_id", goals_response_dict["id"]).order("created_at", desc=True).limit(1).execute()
-            plans_ids_id_response_json = plans_ids_id_response.json()
-            plans_ids_id_response_dict = json.loads(plans_ids_id_response_json)["data"][0]
+    day = request_data["day"]
 
-            print("plans_ids_id:", plans_ids_id_response_dict)
-
-            plans_ids_response = supabase.table("plans_ids").select("plans_ids").eq("id", plans_ids_id_response_dict["plans_ids_id"]).execute()
-            plans_ids_response_json = plans_ids_response.json()
-            plans_ids_response_dict = json.loads(plans_ids_response_json)["data"][0]
+    try:
+        goals_response_dict = get_latest_goal()
+        if goals_response_dict is None:
+            # ゴールがまだ無い場合はエラーメッセージを返す
+            return jsonify({"error": "Goal not found"}), 404
 
-            print("plans_ids:", plans_ids_response_dict)
+        logger.debug("latest_goal: %s", goals_response_dict)
 
-            plans_today_response = supabase.table("plans").select("*").in_("id", plans_ids_response_dict["plans_ids"]).eq("day", day).execute()
-            plans_today_response_json = plans_today_response.json()
-            plans_today_response_dict = json.loads(plans_today_response_json)["data"]
+        plan_ids_response = supabase.table("goals_relations").select("plan_ids").eq("goal_id", goals_response_dict["id"]).order("created_at", desc=True).limit(1).execute()
+        if not plan_ids_response.data:
+            # ゴールのプランが見つからない場合はエラーメッセージを返す
+            return jsonify({"error": "Plans not found"}), 404
+        plan_ids = plan_ids_response.data[0]["plan_ids"]
 
-            print("plans_today:", plans_today_response_dict)
+        logger.debug("plan_ids: %s", plan_ids)
 
-            plans_today = []
-            for plan in plans_today_response_dict:
-                task_response = supabase.table("tasks").select("*").eq("id", plan["task_id"]).execute()
-                task_response_json = task_response.json()
-                task_response_dict = json.loads(task_response_json)["data"][0]
-                plans_today.append({"task": task_response_dict["task"], "point": task_response_dict["point"]})
-            
-            print("plans_today:", plans_today)
+        # NOTE: その日のプランとタスクのjoinはDB側で行う
+        plans_today_response = supabase.rpc("plans_for_day", {"p_plan_ids": plan_ids, "p_day": day}).execute()
+        plans_today = plans_today_response.data
+    except (APIError, httpx.HTTPError):
+        # supabaseとの通信で失敗した場合はエラーメッセージを返す
+        logger.exception("supabase")
+        return jsonify({"error": "upstream"}), 502
 
-            return jsonify({"day": day, "plans_today": plans_today}), 200
-        else:
-            # 必要なデータが見つからない場合はエラーメッセージを返す
-            return jsonify({"error": "Invalid data format"}), 400
+    logger.debug("plans_today: %s", plans_today)
 
-    except Exception as e:
-        # 例外が発生した場合はエラーメッセージを返す
-        return jsonify({"error": str(e)}), 500
+    return jsonify({"day": day, "plans_today": plans_today}), 200
 
 
 @app.route("/api/v1/submit", methods=["POST"])
@@ -410,6 +604,11 @@ def submit():
             day: 1,
             total_points: 10,
         }
+        or a list of them to submit several days at once:
+        [
+            {day: 1, total_points: 10},
+            {day: 2, total_points: 5},
+        ]
 
     Response:
     - Success (HTTP 200 OK):
@@ -420,38 +619,52 @@ def submit():
         {
             "error": "Invalid data format"
         }
-    - Internal Server Error (HTTP 500 Internal Server Error):
+    - Bad Gateway (HTTP 502 Bad Gateway):
+        {
+            "error": "upstream"
+        }
+    - Not Found (HTTP 404 Not Found):
         {
-            "error": "Unexpected error occurred"
+            "error": "Goal not found"
         }
     """
-    try:
-        # POSTリクエストのボディからJSONデータを取得
-        json_data = request.get_json()
-
-        if "day" in json_data and "total_points" in json_data:
-            day = json_data["day"]
-            total_points = json_data["total_points"]
-
-            # goalsの最新のcreated_atを取得する
-            goals_response = supabase.table("goals").select("*").order("created_at", desc=True).limit(1).execute()
-            goals_response_json = goals_response.json()
-            goals_response_dict = json.loads(goals_response_json)["data"][0]
+    # POSTリクエストのボディからJSONデータを取得
+    json_data = request.get_json(silent=True)
+    if json_data is None:
+        # JSONとして読めない場合はエラーメッセージを返す
+        return jsonify({"error": "Invalid data format"}), 400
+
+    # NOTE: 1日分だけの場合もリストとして扱う
+    daily_data = json_data if isinstance(json_data, list) else [json_data]
+
+    # 必要なデータが揃っているか確認
+    if not daily_data or not all(
+        isinstance(item, dict) and SUBMIT_KEYS.issubset(item) and all(is_int(item[key]) for key in SUBMIT_KEYS)
+        for item in daily_data
+    ):
+        # 必要なデータが見つからない場合はエラーメッセージを返す
+        return jsonify({"error": "Invalid data format"}), 400
 
-            print("latest_goal:", goals_response_dict)
-
-            supabase.table("progress").insert({"day": day, "total_points": total_points, "goal_id": goals_response_dict["id"]}).execute()
+    try:
+        goals_response_dict = fetch_latest_goal()
+        if goals_response_dict is None:
+            # ゴールがまだ無い場合はエラーメッセージを返す
+            return jsonify({"error": "Goal not found"}), 404
 
-            # レスポンスとしてメッセージを返す
-            return jsonify({"message": "Data received successfully"}), 200
+        logger.debug("latest_goal: %s", goals_response_dict)
 
-        else:
-            # 必要なデータが見つからない場合はエラーメッセージを返す
-            return jsonify({"error": "Invalid data format"}), 400
+        # 全日分をまとめて1回でinsertする
+        supabase.table("progress").insert([
+            {"day": item["day"], "total_points": item["total_points"], "goal_id": goals_response_dict["id"]}
+            for item in daily_data
+        ]).execute()
+    except (APIError, httpx.HTTPError):
+        # supabaseとの通信で失敗した場合はエラーメッセージを返す
+        logger.exception("supabase")
+        return jsonify({"error": "upstream"}), 502
 
-    except Exception as e:
-        # 例外が発生した場合はエラーメッセージを返す
-        return jsonify({"error": str(e)}), 500
+    # レスポンスとしてメッセージを返す
+    return jsonify({"message": "Data received successfully"}), 200
 
 
 @app.route("/api/v1/points")
@@ -470,31 +683,30 @@ def get_points():
         {
             "points": 88
         }
+    - Not Found (HTTP 404 Not Found):
+        {
+            "error": "Goal not found"
+        }
     """
     try:
-        # goalsの最新のcreated_atを取得する
-        goals_response = supabase.table("goals").select("*").order("created_at", desc=True).limit(1).execute()
-        goals_response_json = goals_response.json()
-        goals_response_dict = json.loads(goals_response_json)["data"][0]
-
-        print("latest_goal:", goals_response_dict)
-
-        progress_response = supabase.table("progress").select("*").eq("goal_id", goals_response_dict["id"]).execute()
-        progress_response_json = progress_response.json()
-        progress_response_dict = json.loads(progress_response_json)["data"]
+        goals_response_dict = get_latest_goal()
+        if goals_response_dict is None:
+            # ゴールがまだ無い場合はエラーメッセージを返す
+            return jsonify({"error": "Goal not found"}), 404
 
-        print("latest_progress:", progress_response_dict)
+        logger.debug("latest_goal: %s", goals_response_dict)
 
-        total_points = 0
-        for progress in progress_response_dict:
-            total_points += progress["total_points"]
+        # NOTE: 合計はDB側で計算する
+        total_points_response = supabase.rpc("get_total_points", {"p_goal_id": goals_response_dict["id"]}).execute()
+        total_points = total_points_response.data
+    except (APIError, httpx.HTTPError):
+        # supabaseとの通信で失敗した場合はエラーメッセージを返す
+        logger.exception("supabase")
+        return jsonify({"error": "upstream"}), 502
 
-        return jsonify({"points": total_points}), 200
-    
-    except Exception as e:
-        # 例外が発生した場合はエラーメッセージを返す
-        return jsonify({"error": str(e)}), 500
+    return app.response_class(POINTS_BODY_TEMPLATE % total_points, mimetype="application/json"), 200
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # NOTE: 本番では gunicorn wsgi:app で起動する
+    app.run(debug=os.getenv("FLASK_ENV") == "development")
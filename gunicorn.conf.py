@@ -0,0 +1,8 @@
+import multiprocessing
+import os
+
+# gunicorn wsgi:app で起動する
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gevent"
+worker_connections = 1000
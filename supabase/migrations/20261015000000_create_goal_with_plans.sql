@@ -0,0 +1,57 @@
+-- ゴール、タスク、プランを1回のRPCでまとめて作成する
+-- NOTE: 関数内の処理は1トランザクションで実行されるので、途中で失敗した場合はすべてロールバックされる
+--
+-- p_goal:  {"item_name": "computer", "item_points": 100}
+-- p_tasks: [{"task": "cleaning", "point": 5}, ...]
+-- p_plans: [{"day": 1, "task_index": 0}, ...]  (task_index は p_tasks 内の位置)
+create or replace function create_goal_with_plans(p_goal jsonb, p_tasks jsonb, p_plans jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+  new_goal goals;
+  new_tasks jsonb;
+  new_task_ids bigint[];
+  new_plan_ids bigint[];
+  new_tasks_ids_id bigint;
+  new_plans_ids_id bigint;
+begin
+  insert into goals (item_name, item_points)
+  values (p_goal->>'item_name', (p_goal->>'item_points')::int)
+  returning * into new_goal;
+
+  -- リクエストの順番を保ったままタスクを作成する
+  with inserted as (
+    insert into tasks (task, point, goal_id)
+    select t.value->>'task', (t.value->>'point')::int, new_goal.id
+    from jsonb_array_elements(p_tasks) with ordinality as t(value, idx)
+    order by t.idx
+    returning *
+  )
+  select jsonb_agg(to_jsonb(inserted) order by inserted.id), array_agg(inserted.id order by inserted.id)
+  into new_tasks, new_task_ids
+  from inserted;
+
+  insert into tasks_ids (tasks_ids) values (new_task_ids)
+  returning id into new_tasks_ids_id;
+
+  with inserted as (
+    insert into plans (day, task_id)
+    select (p.value->>'day')::int, new_task_ids[(p.value->>'task_index')::int + 1]
+    from jsonb_array_elements(p_plans) as p(value)
+    returning id
+  )
+  select array_agg(inserted.id order by inserted.id) into new_plan_ids
+  from inserted;
+
+  insert into plans_ids (plans_ids) values (new_plan_ids)
+  returning id into new_plans_ids_id;
+
+  return jsonb_build_object(
+    'goal', to_jsonb(new_goal),
+    'tasks', new_tasks,
+    'tasks_ids_id', new_tasks_ids_id,
+    'plans_ids_id', new_plans_ids_id
+  );
+end;
+$$;
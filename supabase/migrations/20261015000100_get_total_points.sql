@@ -0,0 +1,8 @@
+-- ゴールに対して記録された進捗ポイントの合計を返す
+create or replace function get_total_points(p_goal_id bigint)
+returns bigint
+language sql
+stable
+as $$
+  select coalesce(sum(total_points), 0) from progress where goal_id = p_goal_id;
+$$;
@@ -0,0 +1,68 @@
+-- tasks_ids, plans_ids テーブルの配列を goals_relations のカラムにまとめる
+alter table goals_relations
+  add column if not exists task_ids bigint[],
+  add column if not exists plan_ids bigint[],
+  alter column tasks_ids_id drop not null,
+  alter column plans_ids_id drop not null;
+
+-- 既存の関連を移行する
+update goals_relations r set task_ids = t.tasks_ids
+from tasks_ids t where t.id = r.tasks_ids_id and r.task_ids is null;
+
+update goals_relations r set plan_ids = p.plans_ids
+from plans_ids p where p.id = r.plans_ids_id and r.plan_ids is null;
+
+-- ゴール、タスク、プランと goals_relations を1回のRPCでまとめて作成する
+--
+-- p_goal:  {"item_name": "computer", "item_points": 100}
+-- p_tasks: [{"task": "cleaning", "point": 5}, ...]
+-- p_plans: [{"day": 1, "task_index": 0}, ...]  (task_index は p_tasks 内の位置)
+create or replace function create_goal_with_plans(p_goal jsonb, p_tasks jsonb, p_plans jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+  new_goal goals;
+  new_tasks jsonb;
+  new_task_ids bigint[];
+  new_plan_ids bigint[];
+  new_goals_relations_id bigint;
+begin
+  insert into goals (item_name, item_points)
+  values (p_goal->>'item_name', (p_goal->>'item_points')::int)
+  returning * into new_goal;
+
+  -- リクエストの順番を保ったままタスクを作成する
+  with inserted as (
+    insert into tasks (task, point, goal_id)
+    select t.value->>'task', (t.value->>'point')::int, new_goal.id
+    from jsonb_array_elements(p_tasks) with ordinality as t(value, idx)
+    order by t.idx
+    returning *
+  )
+  select jsonb_agg(to_jsonb(inserted) order by inserted.id), array_agg(inserted.id order by inserted.id)
+  into new_tasks, new_task_ids
+  from inserted;
+
+  -- plans_for_day は id 順に返すので、同じ日のプランもリクエストの順番で作成する
+  with inserted as (
+    insert into plans (day, task_id)
+    select (p.value->>'day')::int, new_task_ids[(p.value->>'task_index')::int + 1]
+    from jsonb_array_elements(p_plans) with ordinality as p(value, idx)
+    order by p.idx
+    returning id
+  )
+  select array_agg(inserted.id order by inserted.id) into new_plan_ids
+  from inserted;
+
+  insert into goals_relations (goal_id, task_ids, plan_ids)
+  values (new_goal.id, new_task_ids, new_plan_ids)
+  returning id into new_goals_relations_id;
+
+  return jsonb_build_object(
+    'goal', to_jsonb(new_goal),
+    'tasks', new_tasks,
+    'goals_relations_id', new_goals_relations_id
+  );
+end;
+$$;
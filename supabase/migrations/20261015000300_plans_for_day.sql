@@ -0,0 +1,16 @@
+-- 指定された日のプランを絞り込むためのインデックス
+-- NOTE: plans.id は主キーなので別途インデックスは不要
+create index if not exists plans_day_idx on plans (day) include (task_id);
+
+-- 指定されたプランのうち、その日のプランのタスクを返す
+create or replace function plans_for_day(p_plan_ids bigint[], p_day int)
+returns table(task text, point int)
+language sql
+stable
+as $$
+  select t.task::text, t.point::int
+  from plans p
+  join tasks t on t.id = p.task_id
+  where p.id = any(p_plan_ids) and p.day = p_day
+  order by p.id;
+$$;
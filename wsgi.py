@@ -0,0 +1,6 @@
+# NOTE: socket等をgeventに対応させるため、他のimportより先にmonkey patchする
+from gevent import monkey
+
+monkey.patch_all()
+
+from app import app  # noqa: E402